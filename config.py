@@ -33,6 +33,9 @@ COORDENADAS_CAMPUS = [
 # Polígono do campus com buffer
 POLYGON_CAMPUS = Polygon(COORDENADAS_CAMPUS).buffer(0.0003)
 
+# --- Cache local do grafo (apague o arquivo para baixar de novo do OSM) ---
+CAMINHO_CACHE_GRAFO = "cache/grafo_unifor.graphml"
+
 # --- Centro do mapa ---
 CENTRO_MAPA = [-3.7695, -38.4785]
 ZOOM_INICIAL = 17
@@ -58,6 +61,7 @@ def inicializar_estado():
             "clicks": [],
             "rota": [],
             "distancia": None,
+            "gpx_cache": None,  # (rota, nome, GPX) da última exportação
             "perfil_mobilidade": "padrao",  # Perfil padrão
             "initialized": True,
             "debug_mode": False
@@ -1,34 +1,81 @@
 # data_loader.py - CARREGAMENTO DE DADOS
 
+import os
 import streamlit as st
 import osmnx as ox
-from config import POLYGON_CAMPUS, FILTRO_OSM
+from config import POLYGON_CAMPUS, FILTRO_OSM, CAMINHO_CACHE_GRAFO
 
-@st.cache_data(show_spinner=True)
+@st.cache_resource(show_spinner=True)
 def carregar_grafo():
     """
     Carrega o grafo de ruas do campus da Unifor usando OSMnx.
     Retorna apenas a maior componente conectada.
+    
+    O mesmo objeto é compartilhado entre reruns e sessões (cache_resource),
+    então não deve ser modificado: os pesos de cada perfil são calculados à
+    parte (graph_weighting.calcular_pesos_perfil).
+    
+    Depois do primeiro download o grafo é salvo em CAMINHO_CACHE_GRAFO
+    (GraphML) e lido do disco nas próximas execuções, sem acessar o Overpass.
     """
     with st.spinner("🔄 Carregando rede de caminhos da Unifor..."):
-        try:
-            ox.settings.useful_tags_way = ['wheelchair', 'surface', 'width', 'incline', 
-                      'ramp', 'crossing', 'highway']
-            G = ox.graph_from_polygon(
-                POLYGON_CAMPUS,
-                custom_filter=FILTRO_OSM,
-                simplify=True,
-            )
-            
-            # Mantém somente a maior componente (evita erro de NoPath)
-            G = ox.truncate.largest_component(G, strongly=True)
-            
-            st.success(f"✅ Grafo carregado: {len(G.nodes)} nós e {len(G.edges)} arestas")
-            return G
+        G = _ler_grafo_em_cache()
+        
+        if G is None:
+            try:
+                ox.settings.useful_tags_way = ['wheelchair', 'surface', 'width', 'incline', 
+                          'ramp', 'crossing', 'highway']
+                G = ox.graph_from_polygon(
+                    POLYGON_CAMPUS,
+                    custom_filter=FILTRO_OSM,
+                    simplify=True,
+                )
+                
+                # Mantém somente a maior componente (evita erro de NoPath)
+                G = ox.truncate.largest_component(G, strongly=True)
+                
+            except Exception as e:
+                st.error(f"❌ Erro ao carregar grafo: {e}")
+                return None
             
-        except Exception as e:
-            st.error(f"❌ Erro ao carregar grafo: {e}")
-            return None
+            _salvar_grafo_em_cache(G)
+        
+        st.success(f"✅ Grafo carregado: {len(G.nodes)} nós e {len(G.edges)} arestas")
+        return G
+
+
+def _ler_grafo_em_cache():
+    """
+    Lê o grafo salvo em CAMINHO_CACHE_GRAFO, se houver.
+    
+    Returns:
+        Grafo NetworkX, ou None se o arquivo não existir ou não puder ser lido
+        (nesse caso o grafo é baixado de novo)
+    """
+    if not os.path.exists(CAMINHO_CACHE_GRAFO):
+        return None
+    
+    try:
+        return ox.load_graphml(CAMINHO_CACHE_GRAFO)
+    except Exception as e:
+        st.warning(f"⚠️ Cache do grafo inválido ({e}); baixando novamente do OSM.")
+        return None
+
+
+def _salvar_grafo_em_cache(G):
+    """
+    Salva o grafo em CAMINHO_CACHE_GRAFO para as próximas execuções.
+    
+    Uma falha ao salvar (disco cheio, pasta sem permissão) não impede o uso
+    do grafo já baixado; apenas o próximo início baixará de novo.
+    
+    Args:
+        G: Grafo NetworkX
+    """
+    try:
+        ox.save_graphml(G, CAMINHO_CACHE_GRAFO)
+    except Exception as e:
+        st.warning(f"⚠️ Não foi possível salvar o cache do grafo: {e}")
 
 
 @st.cache_data
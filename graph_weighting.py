@@ -1,7 +1,9 @@
 # graph_weighting.py - PONDERAÇÃO DO GRAFO PARA ACESSIBILIDADE
 
+import weakref
 import networkx as nx
-import osmnx as ox
+import numpy as np
+import pandas as pd
 from mobility_profiles import MobilityProfile
 import streamlit as st
 
@@ -32,225 +34,371 @@ def identificar_faixas_pedestres(G):
     return faixas
 
 
-def eh_cruzamento_de_via(G, u, v, key):
+def extrair_atributos_arestas(G):
     """
-    Verifica se uma aresta representa um cruzamento de via (rua).
+    Extrai, em uma única passada, os atributos das arestas usados na ponderação.
     
-    Cruzamentos são identificados quando:
-    - A aresta conecta vias de tipos diferentes
-    - Os nós têm múltiplas conexões (interseções)
-    - A aresta cruza uma via não-pedestre
+    A coluna 'length_original' guarda a distância física da aresta (o
+    'length_original' anterior, se o grafo já foi ponderado, ou o 'length').
     
     Args:
         G: Grafo NetworkX
-        u, v: Nós da aresta
-        key: Chave da aresta
         
     Returns:
-        bool: True se for um cruzamento de via
+        DataFrame com uma linha por aresta (na ordem de G.edges(keys=True))
+    """
+    colunas = {
+        'u': [], 'v': [], 'key': [], 'length_original': [],
+        'wheelchair': [], 'highway': [], 'incline': [], 'ramp': [],
+        'crossing': [], 'surface': [], 'width': [],
+    }
+    
+    for u, v, key, dados in G.edges(keys=True, data=True):
+        colunas['u'].append(u)
+        colunas['v'].append(v)
+        colunas['key'].append(key)
+        colunas['length_original'].append(dados.get('length_original', dados.get('length', 1.0)))
+        for tag in ('wheelchair', 'highway', 'incline', 'ramp', 'crossing', 'surface', 'width'):
+            colunas[tag].append(dados.get(tag))
+    
+    # dtype=object preserva valores em lista (tags mescladas pela simplificação do OSMnx)
+    return pd.DataFrame({
+        nome: valores if nome == 'length_original' else pd.Series(valores, dtype=object)
+        for nome, valores in colunas.items()
+    })
+
+
+def _valor_numerico(valor, unidade):
     """
-    edge_data = G[u][v][key]
+    Converte uma tag numérica do OSM (ex: "7%", "1.5 m") em float.
     
-    # Verifica se a aresta tem tags que indicam cruzamento
-    if edge_data.get('crossing') in ['yes', 'marked', 'zebra', 'traffic_signals']:
-        return True
+    Args:
+        valor: Valor da tag
+        unidade: Sufixo a remover de valores em texto (ex: "%" ou "m")
+        
+    Returns:
+        float ou NaN se a tag estiver vazia ou não for numérica
+    """
+    if not valor:
+        return np.nan
+    
+    try:
+        if isinstance(valor, str):
+            valor = valor.replace(unidade, '').strip()
+        return float(valor)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def identificar_cruzamentos(G, arestas):
+    """
+    Verifica quais arestas representam um cruzamento de via (rua).
     
-    # Verifica grau dos nós (interseções têm muitas conexões)
-    grau_u = G.degree(u)
-    grau_v = G.degree(v)
+    Cruzamentos são identificados quando:
+    - A aresta tem tag de faixa (crossing=yes/marked/zebra/traffic_signals)
+    - Ou a aresta é de pedestre, liga dois nós de interseção (grau >= 3) e
+      seu nó de origem também dá acesso a uma via de veículos
     
-    # Se ambos os nós têm grau >= 3, provavelmente é uma interseção
-    if grau_u >= 3 and grau_v >= 3:
-        # Verifica se conecta tipos diferentes de vias
-        tipo_aresta = edge_data.get('highway', 'footway')
+    Args:
+        G: Grafo NetworkX
+        arestas: DataFrame de extrair_atributos_arestas
         
-        # Se é footway/path conectando com residential/service, é cruzamento
-        if tipo_aresta in ['footway', 'path', 'pedestrian']:
-            for vizinho in G.neighbors(u):
-                for k in G[u][vizinho]:
-                    tipo_vizinho = G[u][vizinho][k].get('highway', '')
-                    if tipo_vizinho in ['residential', 'service', 'living_street', 'unclassified']:
-                        return True
-    
-    return False
+    Returns:
+        Array booleano com uma posição por aresta
+    """
+    tem_tag_faixa = arestas['crossing'].isin(['yes', 'marked', 'zebra', 'traffic_signals']).to_numpy()
+    
+    # Interseções têm muitas conexões
+    graus = dict(G.degree())
+    intersecao = (
+        (arestas['u'].map(graus).to_numpy() >= 3) &
+        (arestas['v'].map(graus).to_numpy() >= 3)
+    )
+    
+    # Arestas sem tag highway são tratadas como footway
+    eh_pedestre = (
+        arestas['highway'].isin(['footway', 'path', 'pedestrian']) |
+        arestas['highway'].isna()
+    ).to_numpy()
+    
+    # Nós de onde sai alguma via de veículos
+    eh_via = arestas['highway'].isin(['residential', 'service', 'living_street', 'unclassified'])
+    nos_junto_via = set(arestas.loc[eh_via, 'u'])
+    junto_via = arestas['u'].isin(nos_junto_via).to_numpy()
+    
+    return tem_tag_faixa | (intersecao & eh_pedestre & junto_via)
 
 
-def encontrar_faixa_proxima(G, u, v, faixas_pedestres, raio=50):
+def distancia_faixa_mais_proxima(G, arestas, faixas_pedestres, raio=50):
     """
-    Procura por faixas de pedestres próximas a uma aresta.
+    Calcula a distância do ponto médio de cada aresta até a faixa mais próxima.
     
     Args:
         G: Grafo NetworkX
-        u, v: Nós da aresta
+        arestas: DataFrame de extrair_atributos_arestas (ou um recorte dele)
         faixas_pedestres: Set de nós que são faixas
         raio: Raio de busca em metros
         
     Returns:
-        float: Distância para a faixa mais próxima (ou None se não houver)
+        Array com a distância em metros (NaN se não houver faixa dentro do raio)
     """
-    if not faixas_pedestres:
-        return None
+    distancias = np.full(len(arestas), np.nan)
+    
+    if not faixas_pedestres or arestas.empty:
+        return distancias
     
-    # Coordenadas dos nós
-    lat_u, lon_u = G.nodes[u]['y'], G.nodes[u]['x']
-    lat_v, lon_v = G.nodes[v]['y'], G.nodes[v]['x']
+    lat_faixas = np.array([G.nodes[f]['y'] for f in faixas_pedestres])
+    lon_faixas = np.array([G.nodes[f]['x'] for f in faixas_pedestres])
     
-    # Ponto médio da aresta
+    # Ponto médio de cada aresta
+    lat_u = np.array([G.nodes[u]['y'] for u in arestas['u']])
+    lon_u = np.array([G.nodes[u]['x'] for u in arestas['u']])
+    lat_v = np.array([G.nodes[v]['y'] for v in arestas['v']])
+    lon_v = np.array([G.nodes[v]['x'] for v in arestas['v']])
     lat_meio = (lat_u + lat_v) / 2
     lon_meio = (lon_u + lon_v) / 2
     
-    distancia_minima = float('inf')
-    
-    for faixa_id in faixas_pedestres:
-        lat_faixa = G.nodes[faixa_id]['y']
-        lon_faixa = G.nodes[faixa_id]['x']
-        
-        # Calcula distância euclidiana aproximada (em graus)
-        dist = ((lat_meio - lat_faixa)**2 + (lon_meio - lon_faixa)**2)**0.5
-        
-        # Converte para metros (aproximação: 1 grau ≈ 111km)
-        dist_metros = dist * 111000
-        
-        if dist_metros < distancia_minima:
-            distancia_minima = dist_metros
+    # Distância euclidiana aproximada (em graus) para todas as faixas de uma vez,
+    # convertida para metros (aproximação: 1 grau ≈ 111km)
+    dist = (
+        (lat_meio[:, None] - lat_faixas[None, :])**2 +
+        (lon_meio[:, None] - lon_faixas[None, :])**2
+    )**0.5
+    dist_metros = dist.min(axis=1) * 111000
     
-    if distancia_minima <= raio:
-        return distancia_minima
+    dentro_raio = dist_metros <= raio
+    distancias[dentro_raio] = dist_metros[dentro_raio]
     
-    return None
+    return distancias
 
 
-def calcular_peso_aresta(G, u, v, key, perfil: MobilityProfile, faixas_pedestres: set):
+def calcular_pesos_arestas(G, arestas, perfil: MobilityProfile, faixas_pedestres: set, cruzamentos):
     """
-    Calcula o peso de uma aresta baseado no perfil de mobilidade.
+    Calcula o peso de todas as arestas baseado no perfil de mobilidade.
+    
+    Cada regra é aplicada como uma multiplicação vetorizada sobre o fator de
+    penalização das arestas que a satisfazem.
     
     Args:
         G: Grafo NetworkX
-        u, v: Nós origem e destino da aresta
-        key: Chave da aresta (para multigrafos)
+        arestas: DataFrame de extrair_atributos_arestas
         perfil: Perfil de mobilidade do usuário
         faixas_pedestres: Set de nós que são faixas de pedestres
+        cruzamentos: Array booleano de identificar_cruzamentos
         
     Returns:
-        float: Peso ajustado da aresta
+        np.ndarray: Peso ajustado de cada aresta
     """
-    # Pega dados da aresta
-    edge_data = G[u][v][key]
-    
     # Começa com a distância física (já existe no grafo OSM)
-    peso_base = edge_data.get('length', 1.0)
+    peso_base = arestas['length_original'].to_numpy(dtype=float)
     
     # Fator multiplicador (inicia em 1.0)
-    fator_penalizacao = 1.0
+    fator_penalizacao = np.ones(len(arestas))
     
     # 1. VERIFICA ACESSIBILIDADE PARA CADEIRAS DE RODAS
-    wheelchair_tag = edge_data.get('wheelchair', None)
-    
-    if wheelchair_tag == 'no' and perfil.requer_acessibilidade:
+    if perfil.requer_acessibilidade:
         # Caminho explicitamente NÃO acessível
-        fator_penalizacao *= perfil.penalizacao_sem_rampa
+        fator_penalizacao[arestas['wheelchair'].eq('no').to_numpy()] *= perfil.penalizacao_sem_rampa
     
-    elif wheelchair_tag == 'limited':
-        # Acessibilidade limitada
-        fator_penalizacao *= (perfil.penalizacao_sem_rampa * 0.5)
+    # Acessibilidade limitada
+    fator_penalizacao[arestas['wheelchair'].eq('limited').to_numpy()] *= (perfil.penalizacao_sem_rampa * 0.5)
     
     # 2. VERIFICA PRESENÇA DE ESCADAS
-    highway_type = edge_data.get('highway', '')
-    
-    if highway_type == 'steps':
-        # É uma escada
-        fator_penalizacao *= perfil.penalizacao_escadas
-    
-    # 3. VERIFICA INCLINAÇÃO (se disponível)
-    incline = edge_data.get('incline', None)
-    
-    if incline:
-        try:
-            # Tenta extrair valor numérico da inclinação
-            if isinstance(incline, str):
-                incline = incline.replace('%', '').strip()
-                incline_valor = abs(float(incline))
-            else:
-                incline_valor = abs(float(incline))
-            
-            # Se inclinação > 5%, penaliza
-            if incline_valor > 5.0:
-                fator_penalizacao *= perfil.penalizacao_inclinacao
-                
-        except (ValueError, TypeError):
-            # Se não conseguir converter, ignora
-            pass
+    fator_penalizacao[arestas['highway'].eq('steps').to_numpy()] *= perfil.penalizacao_escadas
+    
+    # 3. VERIFICA INCLINAÇÃO (se disponível) - penaliza se > 5%
+    incline_valor = np.abs([_valor_numerico(valor, '%') for valor in arestas['incline']])
+    fator_penalizacao[incline_valor > 5.0] *= perfil.penalizacao_inclinacao
     
     # 4. VERIFICA PRESENÇA DE RAMPA
-    if 'ramp' in highway_type or edge_data.get('ramp') == 'yes':
+    if perfil.requer_acessibilidade:
         # Tem rampa - REDUZ penalização para perfis que precisam
-        if perfil.requer_acessibilidade:
-            fator_penalizacao *= 0.7  # Incentiva uso de rampas
+        tem_rampa = np.array([
+            tipo is not None and 'ramp' in tipo for tipo in arestas['highway']
+        ], dtype=bool) | arestas['ramp'].eq('yes').to_numpy()
+        fator_penalizacao[tem_rampa] *= 0.7  # Incentiva uso de rampas
     
-    # 5. VERIFICA CRUZAMENTOS COM FAIXAS DE PEDESTRES (LÓGICA MELHORADA)
+    # 5. VERIFICA CRUZAMENTOS COM FAIXAS DE PEDESTRES
     if perfil.prefere_faixas:
-        # Primeiro: verifica se é um nó que JÁ É uma faixa
-        tem_faixa_inicio = u in faixas_pedestres
-        tem_faixa_fim = v in faixas_pedestres
-        
         # Se passar por uma faixa, incentiva fortemente
-        if tem_faixa_inicio or tem_faixa_fim:
-            fator_penalizacao *= 0.5  # FORTE incentivo
-        else:
-            # Não passa diretamente por faixa
-            # Verifica se é um cruzamento de via
-            eh_cruzamento = eh_cruzamento_de_via(G, u, v, key)
-            
-            if eh_cruzamento:
-                # É um cruzamento! Verifica se há faixa próxima
-                dist_faixa = encontrar_faixa_proxima(G, u, v, faixas_pedestres, raio=30)
-                
-                if dist_faixa is None:
-                    # CRUZAMENTO SEM FAIXA PRÓXIMA - penalização MUITO forte
-                    fator_penalizacao *= perfil.penalizacao_sem_faixa * 10  # 10x mais forte
-                else:
-                    # Tem faixa próxima mas não está usando - penaliza moderadamente
-                    # Quanto mais perto da faixa, maior a penalização por não usar
-                    penalizacao_distancia = 1 + (30 - dist_faixa) / 30 * perfil.penalizacao_sem_faixa
-                    fator_penalizacao *= penalizacao_distancia
-    
-    # 6. VERIFICA TIPO DE SUPERFÍCIE
-    surface = edge_data.get('surface', '')
+        passa_por_faixa = (
+            arestas['u'].isin(faixas_pedestres) | arestas['v'].isin(faixas_pedestres)
+        ).to_numpy()
+        fator_penalizacao[passa_por_faixa] *= 0.5  # FORTE incentivo
+        
+        # Cruzamentos que não passam diretamente por faixa: procura faixa próxima
+        idx_cruzamentos = np.flatnonzero(cruzamentos & ~passa_por_faixa)
+        dist_faixa = distancia_faixa_mais_proxima(
+            G, arestas.iloc[idx_cruzamentos], faixas_pedestres, raio=30
+        )
+        sem_faixa = np.isnan(dist_faixa)
+        
+        # CRUZAMENTO SEM FAIXA PRÓXIMA - penalização MUITO forte
+        fator_penalizacao[idx_cruzamentos[sem_faixa]] *= perfil.penalizacao_sem_faixa * 10
+        
+        # Tem faixa próxima mas não está usando - penaliza moderadamente
+        # Quanto mais perto da faixa, maior a penalização por não usar
+        penalizacao_distancia = 1 + (30 - dist_faixa[~sem_faixa]) / 30 * perfil.penalizacao_sem_faixa
+        fator_penalizacao[idx_cruzamentos[~sem_faixa]] *= penalizacao_distancia
     
     if perfil.requer_acessibilidade:
+        # 6. VERIFICA TIPO DE SUPERFÍCIE
         # Superfícies irregulares são ruins para mobilidade reduzida
-        if surface in ['unpaved', 'gravel', 'dirt', 'grass', 'sand']:
-            fator_penalizacao *= 2.0
-        elif surface in ['paved', 'asphalt', 'concrete']:
-            fator_penalizacao *= 0.9  # Superfície boa
-    
-    # 7. LARGURA DO CAMINHO
-    width = edge_data.get('width', None)
-    
-    if width and perfil.requer_acessibilidade:
-        try:
-            if isinstance(width, str):
-                width = width.replace('m', '').strip()
-                width_valor = float(width)
-            else:
-                width_valor = float(width)
-            
-            # Caminhos muito estreitos são ruins para cadeiras
-            if width_valor < 1.5:  # Menos de 1.5m
-                fator_penalizacao *= 1.5
-                
-        except (ValueError, TypeError):
-            pass
+        superficie = arestas['surface']
+        fator_penalizacao[superficie.isin(['unpaved', 'gravel', 'dirt', 'grass', 'sand']).to_numpy()] *= 2.0
+        fator_penalizacao[superficie.isin(['paved', 'asphalt', 'concrete']).to_numpy()] *= 0.9  # Superfície boa
+        
+        # 7. LARGURA DO CAMINHO
+        # Caminhos muito estreitos (menos de 1.5m) são ruins para cadeiras
+        width_valor = np.array([_valor_numerico(valor, 'm') for valor in arestas['width']])
+        fator_penalizacao[width_valor < 1.5] *= 1.5
     
     # Peso final = distância * fator de penalização
-    peso_final = peso_base * fator_penalizacao
+    return peso_base * fator_penalizacao
+
+
+# Estruturas derivadas de cada grafo (ponderação, CSR, índice espacial...).
+# Ficam fora de G.graph porque G.copy() copia G.graph de forma rasa, e a
+# cópia passaria a compartilhar os caches do original. As chaves são fracas:
+# um grafo descartado libera junto os seus caches.
+_CACHES_GRAFOS = weakref.WeakKeyDictionary()
+
+
+def obter_cache_grafo(G):
+    """
+    Obtém o dicionário de estruturas derivadas guardadas para um grafo.
+    
+    O cache é descartado se o número de nós ou de arestas mudar desde que
+    foi criado (grafo modificado depois de consultado). ponderar_grafo e
+    restaurar_pesos_originais o descartam ao regravar 'length'; quem alterar
+    atributos das arestas por outro meio deve chamar invalidar_cache_grafo.
+    Os valores guardados não devem referenciar o próprio G, ou o grafo nunca
+    seria liberado.
+    
+    Args:
+        G: Grafo NetworkX
+        
+    Returns:
+        Dicionário mutável exclusivo do grafo
+    """
+    assinatura = (G.number_of_nodes(), G.number_of_edges())
+    cache = _CACHES_GRAFOS.get(G)
+    
+    if cache is None or cache["assinatura"] != assinatura:
+        cache = {"assinatura": assinatura}
+        _CACHES_GRAFOS[G] = cache
+    
+    return cache
+
+
+def invalidar_cache_grafo(G):
+    """
+    Descarta as estruturas derivadas guardadas para um grafo.
+    
+    Args:
+        G: Grafo NetworkX cujas arestas foram alteradas
+    """
+    _CACHES_GRAFOS.pop(G, None)
+
+
+def _obter_dados_ponderacao(G):
+    """
+    Obtém os dados da ponderação que não dependem do perfil.
+    
+    A tabela de atributos, as faixas e os cruzamentos são calculados uma
+    única vez por grafo (ver obter_cache_grafo); trocar de perfil só refaz as
+    multiplicações de calcular_pesos_arestas.
+    
+    Args:
+        G: Grafo NetworkX
+        
+    Returns:
+        Tupla (arestas, faixas_pedestres, cruzamentos)
+    """
+    cache = obter_cache_grafo(G)
+    dados = cache.get("dados_ponderacao")
+    
+    if dados is None:
+        arestas = extrair_atributos_arestas(G)
+        dados = (arestas, identificar_faixas_pedestres(G), identificar_cruzamentos(G, arestas))
+        cache["dados_ponderacao"] = dados
     
-    return peso_final
+    return dados
+
+
+def calcular_pesos_perfil(G, perfil: MobilityProfile = None):
+    """
+    Calcula o peso de cada aresta para um perfil, sem modificar o grafo.
+    
+    O resultado fica guardado no cache do grafo por perfil, então alternar entre
+    perfis só escolhe outro array já calculado.
+    
+    Sem perfil, usa o atributo 'length' atual das arestas: a distância física,
+    ou os pesos gravados por ponderar_grafo se o grafo tiver sido ponderado.
+    Os perfis sempre partem da distância física ('length_original').
+    
+    Args:
+        G: Grafo NetworkX
+        perfil: Perfil de mobilidade (None = atributo 'length' atual)
+        
+    Returns:
+        np.ndarray: Peso de cada aresta, na ordem de G.edges(keys=True)
+    """
+    pesos_perfis = obter_cache_grafo(G).setdefault("pesos_perfis", {})
+    chave = perfil.nome if perfil is not None else None
+    pesos = pesos_perfis.get(chave)
+    
+    if pesos is None:
+        if perfil is None:
+            pesos = np.fromiter(
+                (dados.get('length', 1.0) for _, _, dados in G.edges(data=True)),
+                dtype=float,
+                count=G.number_of_edges(),
+            )
+        else:
+            arestas, faixas_pedestres, cruzamentos = _obter_dados_ponderacao(G)
+            pesos = calcular_pesos_arestas(G, arestas, perfil, faixas_pedestres, cruzamentos)
+        pesos_perfis[chave] = pesos
+    
+    return pesos
+
+
+def exibir_resumo_ponderacao(G, perfil: MobilityProfile):
+    """
+    Exibe um resumo da ponderação do perfil quando o modo debug está ativo.
+    
+    Args:
+        G: Grafo NetworkX
+        perfil: Perfil de mobilidade do usuário
+    """
+    if not st.session_state.get("debug_mode", False):
+        return
+    
+    arestas, faixas_pedestres, cruzamentos = _obter_dados_ponderacao(G)
+    pesos = calcular_pesos_perfil(G, perfil)
+    
+    # Contadores de modificações
+    arestas_penalizadas = int((pesos > arestas['length_original'].to_numpy() * 1.5).sum())
+    cruzamentos_detectados = int(cruzamentos.sum())
+    
+    st.info(f"""
+    **Ponderação do Grafo:**
+    - Perfil: {perfil.nome}
+    - Faixas identificadas: {len(faixas_pedestres)}
+    - Cruzamentos detectados: {cruzamentos_detectados}
+    - Arestas penalizadas: {arestas_penalizadas}
+    """)
 
 
 def ponderar_grafo(G, perfil: MobilityProfile):
     """
-    Pondera todas as arestas do grafo baseado no perfil de mobilidade.
+    Grava os pesos do perfil no atributo 'length' das arestas.
+    
+    O app não usa mais esta função: as buscas recebem os pesos de
+    calcular_pesos_perfil e o grafo fica inalterado. Ela continua útil para
+    rodar os algoritmos do NetworkX diretamente sobre um grafo ponderado, e
+    as rotas calculadas sem perfil (perfil=None) passam a usar esses pesos.
+    Ponderar de novo sempre parte da distância física.
     
     Args:
         G: Grafo NetworkX (será modificado in-place)
@@ -259,42 +407,22 @@ def ponderar_grafo(G, perfil: MobilityProfile):
     Returns:
         G: Grafo ponderado
     """
-    # Identifica faixas de pedestres
-    faixas_pedestres = identificar_faixas_pedestres(G)
+    arestas, _, _ = _obter_dados_ponderacao(G)
+    pesos = calcular_pesos_perfil(G, perfil)
     
-    # Contador de modificações
-    arestas_penalizadas = 0
-    cruzamentos_detectados = 0
+    chaves = list(zip(arestas['u'], arestas['v'], arestas['key']))
     
-    # Percorre todas as arestas
-    for u, v, key in G.edges(keys=True):
-        # Calcula peso customizado
-        peso_customizado = calcular_peso_aresta(G, u, v, key, perfil, faixas_pedestres)
-        
-        # Armazena peso original se ainda não existe
-        if 'length_original' not in G[u][v][key]:
-            G[u][v][key]['length_original'] = G[u][v][key].get('length', 1.0)
-        
-        # Atualiza com peso customizado
-        G[u][v][key]['length'] = peso_customizado
-        
-        # Conta se houve penalização significativa
-        if peso_customizado > G[u][v][key]['length_original'] * 1.5:
-            arestas_penalizadas += 1
-        
-        # Conta cruzamentos
-        if eh_cruzamento_de_via(G, u, v, key):
-            cruzamentos_detectados += 1
-    
-    # Informações de debug
-    if st.session_state.get("debug_mode", False):
-        st.info(f"""
-        **Ponderação do Grafo:**
-        - Perfil: {perfil.nome}
-        - Faixas identificadas: {len(faixas_pedestres)}
-        - Cruzamentos detectados: {cruzamentos_detectados}
-        - Arestas penalizadas: {arestas_penalizadas}
-        """)
+    # Armazena pesos originais (mantém os que já existem de uma ponderação anterior)
+    nx.set_edge_attributes(G, dict(zip(chaves, arestas['length_original'].tolist())), 'length_original')
+    
+    # Atualiza com pesos customizados
+    nx.set_edge_attributes(G, dict(zip(chaves, pesos.tolist())), 'length')
+    
+    # 'length' mudou: estruturas derivadas (pesos sem perfil, CSR, rotas
+    # memorizadas) precisam ser refeitas
+    invalidar_cache_grafo(G)
+    
+    exibir_resumo_ponderacao(G, perfil)
     
     return G
 
@@ -309,8 +437,7 @@ def restaurar_pesos_originais(G):
     Returns:
         G: Grafo com pesos restaurados
     """
-    for u, v, key in G.edges(keys=True):
-        if 'length_original' in G[u][v][key]:
-            G[u][v][key]['length'] = G[u][v][key]['length_original']
+    nx.set_edge_attributes(G, nx.get_edge_attributes(G, 'length_original'), 'length')
+    invalidar_cache_grafo(G)
     
-    return G
\ No newline at end of file
+    return G
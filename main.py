@@ -11,7 +11,7 @@ from ui_components import (
 )
 from route_calculator import calcular_rota_completa
 from mobility_profiles import obter_perfil
-from graph_weighting import ponderar_grafo
+from graph_weighting import exibir_resumo_ponderacao
 
 # --- Configuração inicial ---
 configurar_pagina()
@@ -21,9 +21,9 @@ inicializar_estado()
 G = carregar_grafo()
 pontos, categorias = carregar_pois("pontos de interesse.txt")
 
-# --- Pondera o grafo baseado no perfil de mobilidade ---
+# --- Perfil de mobilidade (os pesos são aplicados nas buscas, sem alterar o grafo) ---
 perfil_atual = obter_perfil(st.session_state["perfil_mobilidade"])
-G = ponderar_grafo(G, perfil_atual)
+exibir_resumo_ponderacao(G, perfil_atual)
 
 # --- Interface ---
 renderizar_cabecalho()
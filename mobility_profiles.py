@@ -3,9 +3,9 @@
 from dataclasses import dataclass
 from typing import Dict
 
-@dataclass
+@dataclass(frozen=True)
 class MobilityProfile:
-    """Perfil de mobilidade do usuário"""
+    """Perfil de mobilidade do usuário (imutável, pode ser chave de cache)"""
     nome: str
     descricao: str
     icone: str
@@ -1,17 +1,53 @@
 # route_calculator.py - CÁLCULO DE ROTAS
 
 import streamlit as st
-import osmnx as ox
 import networkx as nx
 import math
+import threading
+from collections import OrderedDict
+from itertools import pairwise
+import numpy as np
+from dataclasses import dataclass, field
+from sklearn.neighbors import BallTree
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from heapq import heappush, heappop
+from graph_weighting import calcular_pesos_perfil, obter_cache_grafo
+
+
+def _distancias_retas(delta_lat, delta_lon, cos_lat):
+    """
+    Distância em linha reta (metros) a partir de diferenças de coordenadas.
+    
+    Projeção equiretangular com um único cos(lat) para todos os pares, o que
+    a torna uma métrica (vale a desigualdade triangular).
+    
+    Args:
+        delta_lat, delta_lon: Diferenças em graus (escalares ou arrays)
+        cos_lat: Cosseno da latitude usado para converter a longitude
+        
+    Returns:
+        Distância em metros (mesmo formato da entrada)
+    """
+    # Conversão aproximada para metros (1 grau ≈ 111km no equador)
+    metros_por_grau_lat = 111000
+    metros_por_grau_lon = 111000 * cos_lat
+    
+    return np.sqrt(
+        (delta_lat * metros_por_grau_lat)**2 +
+        (delta_lon * metros_por_grau_lon)**2
+    )
 
 
 def heuristica_astar(G, no_atual, no_destino):
     """
     Função heurística para o algoritmo A*.
     
-    Calcula a distância euclidiana entre o nó atual e o nó destino.
-    Esta é uma heurística admissível (nunca superestima o custo real).
+    Calcula a distância em linha reta entre o nó atual e o nó destino, com a
+    mesma fórmula de heuristicas_astar (sem fator). Só é admissível para
+    pesos que nunca ficam abaixo da distância em linha reta, como os
+    comprimentos físicos ('length' sem ponderação). Para pesos de perfil,
+    use heuristicas_astar com o fator_heuristica do perfil.
     
     Args:
         G: Grafo NetworkX
@@ -22,27 +58,358 @@ def heuristica_astar(G, no_atual, no_destino):
         Estimativa de distância até o destino em metros
     """
     # Obtém coordenadas dos nós (x=lon, y=lat no OSMnx)
-    lat_atual = G.nodes[no_atual]["y"]
-    lon_atual = G.nodes[no_atual]["x"]
-    
     lat_destino = G.nodes[no_destino]["y"]
-    lon_destino = G.nodes[no_destino]["x"]
     
-    # Diferenças em graus
-    delta_lat = lat_destino - lat_atual
-    delta_lon = lon_destino - lon_atual
+    return float(_distancias_retas(
+        lat_destino - G.nodes[no_atual]["y"],
+        G.nodes[no_destino]["x"] - G.nodes[no_atual]["x"],
+        math.cos(math.radians(lat_destino)),
+    ))
+
+
+def heuristicas_astar(G, no_destino, fator=1.0):
+    """
+    Calcula a heurística do A* de todos os nós até o destino de uma só vez.
     
-    # Conversão aproximada para metros (1 grau ≈ 111km no equador)
-    # Ajustamos pela latitude para maior precisão
-    metros_por_grau_lat = 111000
-    metros_por_grau_lon = 111000 * math.cos(math.radians(lat_atual))
+    Versão vetorizada de heuristica_astar: distância em linha reta até o
+    destino, calculada com NumPy sobre as coordenadas da versão CSR do grafo
+    e multiplicada por fator. Com o fator_heuristica do perfil (ver PesosCSR)
+    a heurística é consistente, e portanto admissível, para os pesos desse
+    perfil.
     
-    dist_metros = math.sqrt(
-        (delta_lat * metros_por_grau_lat)**2 + 
-        (delta_lon * metros_por_grau_lon)**2
+    Args:
+        G: Grafo NetworkX
+        no_destino: ID do nó de destino
+        fator: Peso mínimo do perfil por metro de linha reta
+        
+    Returns:
+        Lista com a estimativa, indexada pelo índice CSR do nó
+    """
+    csr = _obter_csr(G)
+    destino = csr.indice[no_destino]
+    
+    distancias = _distancias_retas(
+        csr.lat[destino] - csr.lat,
+        csr.lon[destino] - csr.lon,
+        math.cos(math.radians(csr.lat[destino])),
     )
     
-    return dist_metros
+    return (fator * distancias).tolist()
+
+
+@dataclass
+class PesosCSR:
+    """Pesos de um perfil nas posições da adjacência de GrafoCSR."""
+    saida: np.ndarray  # peso de cada posição CSR de saída
+    listas: tuple  # (pesos de saída, pesos de entrada) como listas Python
+    matriz: csr_matrix  # matriz de adjacência ponderada para o scipy.sparse.csgraph
+    fator_heuristica: float  # menor peso por metro de linha reta entre as arestas
+
+
+@dataclass
+class GrafoCSR:
+    """
+    Estrutura do grafo achatada em arrays no formato CSR (linha = nó de origem).
+    
+    Só guarda a topologia, que não depende do perfil: arestas paralelas do
+    multigrafo ocupam a mesma posição CSR e os pesos de cada perfil são
+    reduzidos ao menor valor por posição (ver _obter_pesos_csr). Guarda a
+    adjacência de saída (busca para frente) e a de entrada (busca para trás)
+    também como listas Python, mais rápidas de indexar nos laços de busca,
+    e um DiGraph simples com a posição CSR de cada aresta para os algoritmos
+    do NetworkX.
+    """
+    nos: list  # índice -> ID do nó
+    indice: dict  # ID do nó -> índice
+    lat: np.ndarray  # coordenadas dos nós, na ordem dos índices
+    lon: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    posicao_aresta: np.ndarray  # aresta de G.edges(keys=True) -> posição CSR
+    posicao_entrada: np.ndarray  # posição da adjacência de entrada -> posição CSR
+    adjacencias: tuple  # ((indptr, indices) de saída, (indptr, indices) de entrada)
+    digrafo: nx.DiGraph  # nós 0..N-1 (índices), uma aresta por par, com atributo "posicao"
+    pesos_perfis: dict = field(default_factory=dict)  # nome do perfil -> PesosCSR
+
+
+def _montar_csr(num_nos, origens, destinos):
+    """
+    Monta arrays CSR com uma única posição para cada par de nós.
+    
+    Args:
+        num_nos: Número de nós do grafo
+        origens, destinos: Índices das pontas de cada aresta
+        
+    Returns:
+        Tupla (indptr, indices, posicoes), onde posicoes[i] é a posição CSR da
+        i-ésima aresta de entrada
+    """
+    ordem = np.lexsort((destinos, origens))
+    origens_ord, destinos_ord = origens[ordem], destinos[ordem]
+    
+    # Início de cada par (origem, destino) distinto
+    novo_par = np.ones(len(origens_ord), dtype=bool)
+    novo_par[1:] = (origens_ord[1:] != origens_ord[:-1]) | (destinos_ord[1:] != destinos_ord[:-1])
+    
+    posicoes = np.empty(len(origens), dtype=np.int64)
+    posicoes[ordem] = np.cumsum(novo_par) - 1
+    
+    indptr = np.searchsorted(origens_ord[novo_par], np.arange(num_nos + 1))
+    
+    return indptr, destinos_ord[novo_par], posicoes
+
+
+def _obter_csr(G):
+    """
+    Obtém a versão CSR do grafo usada pelas buscas.
+    
+    É construída uma única vez e guardada no cache do grafo (obter_cache_grafo).
+    
+    Args:
+        G: Grafo NetworkX
+        
+    Returns:
+        GrafoCSR com a topologia do grafo
+    """
+    cache = obter_cache_grafo(G)
+    csr = cache.get("csr")
+    
+    if csr is None:
+        nos = list(G.nodes)
+        indice = {no: i for i, no in enumerate(nos)}
+        num_nos = len(nos)
+        
+        arestas = list(G.edges(keys=True))
+        origens = np.fromiter((indice[u] for u, _, _ in arestas), dtype=np.int64, count=len(arestas))
+        destinos = np.fromiter((indice[v] for _, v, _ in arestas), dtype=np.int64, count=len(arestas))
+        
+        indptr, indices, posicao_aresta = _montar_csr(num_nos, origens, destinos)
+        
+        # Adjacência de entrada: as mesmas posições, ordenadas pelo nó de destino
+        linhas = np.repeat(np.arange(num_nos), np.diff(indptr))
+        posicao_entrada = np.lexsort((linhas, indices))
+        indptr_entrada = np.searchsorted(indices[posicao_entrada], np.arange(num_nos + 1))
+        indices_entrada = linhas[posicao_entrada]
+        
+        # Rotulado pelos índices, para que as funções de peso e heurística
+        # dos algoritmos do NetworkX possam indexar listas diretamente
+        digrafo = nx.DiGraph()
+        digrafo.add_nodes_from(range(num_nos))
+        digrafo.add_weighted_edges_from(
+            zip(linhas.tolist(), indices.tolist(), range(len(indices))),
+            weight="posicao",
+        )
+        
+        csr = GrafoCSR(
+            nos=nos,
+            indice=indice,
+            lat=np.array([G.nodes[no]["y"] for no in nos]),
+            lon=np.array([G.nodes[no]["x"] for no in nos]),
+            indptr=indptr,
+            indices=indices,
+            posicao_aresta=posicao_aresta,
+            posicao_entrada=posicao_entrada,
+            adjacencias=(
+                (indptr.tolist(), indices.tolist()),
+                (indptr_entrada.tolist(), indices_entrada.tolist()),
+            ),
+            digrafo=digrafo,
+        )
+        cache["csr"] = csr
+    
+    return csr
+
+
+def _obter_pesos_csr(G, perfil=None):
+    """
+    Obtém os pesos de um perfil nas posições CSR do grafo.
+    
+    Calculados uma vez por perfil. Arestas paralelas ficam com o menor peso.
+    
+    Os perfis podem reduzir o peso de uma aresta abaixo do comprimento
+    (ex.: fator 0.5 em faixas de pedestre), e então a distância em linha
+    reta superestima o custo. fator_heuristica é o menor peso por metro de
+    linha reta entre as arestas: com ele, f * h(u) <= peso(u, v) + f * h(v)
+    para toda aresta e todo destino, e as duas buscas A* continuam ótimas.
+    
+    Args:
+        G: Grafo NetworkX
+        perfil: Perfil de mobilidade (None = atributo 'length' atual)
+        
+    Returns:
+        PesosCSR do perfil
+    """
+    csr = _obter_csr(G)
+    chave = perfil.nome if perfil is not None else None
+    pesos = csr.pesos_perfis.get(chave)
+    
+    if pesos is None:
+        saida = np.full(len(csr.indices), np.inf)
+        np.minimum.at(saida, csr.posicao_aresta, calcular_pesos_perfil(G, perfil))
+        
+        # Linha reta de cada aresta com o maior cos(lat) do grafo, que limita
+        # a distância usada pela heurística para qualquer destino
+        linhas = np.repeat(np.arange(len(csr.nos)), np.diff(csr.indptr))
+        retas = _distancias_retas(
+            csr.lat[csr.indices] - csr.lat[linhas],
+            csr.lon[csr.indices] - csr.lon[linhas],
+            np.cos(np.radians(csr.lat)).max(),
+        )
+        com_extensao = retas > 0
+        fator_heuristica = (
+            float((saida[com_extensao] / retas[com_extensao]).min())
+            if com_extensao.any() else 0.0
+        )
+        
+        pesos = PesosCSR(
+            saida=saida,
+            listas=(saida.tolist(), saida[csr.posicao_entrada].tolist()),
+            # O csgraph trata zeros explícitos de matrizes esparsas como arestas
+            matriz=csr_matrix(
+                (saida, csr.indices, csr.indptr),
+                shape=(len(csr.nos), len(csr.nos)),
+            ),
+            fator_heuristica=fator_heuristica,
+        )
+        csr.pesos_perfis[chave] = pesos
+    
+    return pesos
+
+
+def _obter_indice_espacial(G):
+    """
+    Obtém o índice espacial (BallTree) dos nós do grafo.
+    
+    O índice é construído uma única vez e guardado no cache do grafo, evitando que
+    cada consulta reconstrua a árvore como faz ox.distance.nearest_nodes.
+    
+    Args:
+        G: Grafo NetworkX
+        
+    Returns:
+        Tupla (arvore, ids_nos) com a BallTree e o array de IDs dos nós
+    """
+    cache = obter_cache_grafo(G)
+    indice = cache.get("indice_espacial")
+    
+    if indice is None:
+        ids_nos = np.array(list(G.nodes))
+        # Métrica haversine exige (lat, lon) em radianos
+        coords = np.deg2rad([[dados["y"], dados["x"]] for _, dados in G.nodes(data=True)])
+        indice = (BallTree(coords, metric="haversine"), ids_nos)
+        cache["indice_espacial"] = indice
+    
+    return indice
+
+
+def no_mais_proximo(G, lat, lon, usar_cache=False):
+    """
+    Encontra o nó do grafo mais próximo de uma coordenada.
+    
+    Args:
+        G: Grafo NetworkX
+        lat: Latitude do ponto
+        lon: Longitude do ponto
+        usar_cache: Se True, reaproveita consultas já feitas para o mesmo
+            ponto (coordenadas arredondadas a ~10 cm)
+        
+    Returns:
+        ID do nó mais próximo
+    """
+    if usar_cache:
+        # Cliques repetidos no mesmo ponto (ou no mesmo POI) reaproveitam a
+        # consulta anterior
+        lat, lon = round(lat, 6), round(lon, 6)
+    
+    def consultar():
+        arvore, ids_nos = _obter_indice_espacial(G)
+        _, pos = arvore.query(np.deg2rad([[lat, lon]]), k=1)
+        return int(ids_nos[pos[0, 0]])
+    
+    if not usar_cache:
+        return consultar()
+    
+    return _memorizar(G, "nos_proximos", (lat, lon), 1024, consultar)
+
+
+# As sessões do Streamlit rodam em threads e compartilham o mesmo grafo
+_TRAVA_MEMORIA = threading.Lock()
+
+
+def _memorizar(G, nome, chave, limite, calcular):
+    """
+    Memoriza resultados por grafo, descartando os mais antigos (LRU).
+    
+    Os resultados ficam no cache do grafo (obter_cache_grafo), e não num
+    lru_cache de módulo, que manteria vivo todo grafo já consultado.
+    Exceções de calcular não são memorizadas.
+    
+    Args:
+        G: Grafo NetworkX
+        nome: Nome do cache dentro do cache do grafo
+        chave: Chave do resultado (não deve referenciar G)
+        limite: Número máximo de resultados guardados
+        calcular: Função sem argumentos que produz o resultado
+        
+    Returns:
+        Resultado guardado ou recém-calculado
+    """
+    with _TRAVA_MEMORIA:
+        memoria = obter_cache_grafo(G).setdefault(nome, OrderedDict())
+        
+        if chave in memoria:
+            memoria.move_to_end(chave)
+            return memoria[chave]
+    
+    resultado = calcular()
+    
+    with _TRAVA_MEMORIA:
+        memoria[chave] = resultado
+        if len(memoria) > limite:
+            memoria.popitem(last=False)
+    
+    return resultado
+
+
+def _obter_coordenadas_arestas(G):
+    """
+    Obtém as coordenadas (lat, lon) de cada par de nós ligados do grafo.
+    
+    Calculadas uma única vez e guardadas no cache do grafo. Em arestas paralelas
+    usa a primeira disponível no multigraph.
+    
+    Args:
+        G: Grafo NetworkX
+        
+    Returns:
+        Dicionário (u, v) -> array Nx2 com os pontos (lat, lon) da aresta
+    """
+    cache = obter_cache_grafo(G)
+    coordenadas = cache.get("coordenadas_arestas")
+    
+    if coordenadas is None:
+        coordenadas = {}
+        
+        for u, v, attrs in G.edges(data=True):
+            if (u, v) in coordenadas:
+                continue
+            
+            geom = attrs.get("geometry")
+            
+            if geom:
+                # Se tem geometria, usa todos os pontos da curva
+                # (coords vêm como (lon, lat))
+                coordenadas[(u, v)] = np.asarray(geom.coords, dtype=float)[:, 1::-1]
+            else:
+                # Se não tem geometria, usa linha reta entre os nós
+                coordenadas[(u, v)] = np.array([
+                    (G.nodes[u]["y"], G.nodes[u]["x"]),
+                    (G.nodes[v]["y"], G.nodes[v]["x"]),
+                ])
+        
+        cache["coordenadas_arestas"] = coordenadas
+    
+    return coordenadas
 
 
 def extrair_geometria_rota(G, rota_nodes):
@@ -54,94 +421,364 @@ def extrair_geometria_rota(G, rota_nodes):
         rota_nodes: Lista de nós da rota
         
     Returns:
-        Lista de tuplas (lat, lon) representando a rota
+        Lista de pontos [lat, lon] representando a rota
+    """
+    coordenadas = _obter_coordenadas_arestas(G)
+    
+    trechos = [
+        coordenadas[par]
+        for par in pairwise(rota_nodes)
+        if par in coordenadas
+    ]
+    
+    if not trechos:
+        return []
+    
+    return np.concatenate(trechos).tolist()
+
+
+def _peso_com_contagem(pesos, explorados):
+    """
+    Cria uma função de peso que lê os pesos do perfil e registra os nós
+    expandidos pela busca.
+    
+    O NetworkX chama a função de peso para cada aresta (u, v) do nó u que
+    está sendo expandido, então os "u" distintos são os nós explorados.
+    
+    Args:
+        pesos: Lista de pesos por posição CSR (PesosCSR.listas[0])
+        explorados: Set que receberá os nós expandidos
+        
+    Returns:
+        Função peso(u, v, dados) para o DiGraph simples de GrafoCSR
+    """
+    def peso(u, v, dados):
+        explorados.add(u)
+        return pesos[dados["posicao"]]
+    
+    return peso
+
+
+def _busca_bidirecional(G, no_origem, no_destino, usar_heuristica=False, perfil=None):
     """
-    pontos_rota = []
+    Busca bidirecional (Dijkstra ou A*) com contagem de nós explorados.
+    
+    As buscas para frente (a partir da origem) e para trás (a partir do
+    destino) são alternadas pelo menor topo de fila. A busca termina quando
+    a soma dos topos atinge o melhor caminho já encontrado (mu).
     
-    for u, v in zip(rota_nodes[:-1], rota_nodes[1:]):
-        edge_data = G.get_edge_data(u, v)
+    Com heurística, usa o potencial médio de Pohl, p(v) = (h_destino(v) -
+    h_origem(v)) / 2, somado na busca para frente e subtraído na busca para
+    trás, o que mantém as duas buscas consistentes entre si.
+    
+    A busca percorre a versão CSR do grafo (ver _obter_csr) com os pesos do
+    perfil, indexando listas em vez de dicionários de atributos das arestas.
+    
+    Args:
+        G: Grafo NetworkX (MultiDiGraph)
+        no_origem: ID do nó de origem
+        no_destino: ID do nó de destino
+        usar_heuristica: Se True, A* bidirecional; se False, Dijkstra bidirecional
+        perfil: Perfil de mobilidade cujos pesos serão usados (None = atributo 'length' atual)
         
-        if not edge_data:
-            continue
+    Returns:
+        Tupla (distancia, rota_nodes, nos_explorados)
+    """
+    if no_origem == no_destino:
+        return 0, [no_origem], 0
+    
+    csr = _obter_csr(G)
+    pesos_csr = _obter_pesos_csr(G, perfil)
+    nos = csr.nos
+    num_nos = len(nos)
+    origem = csr.indice[no_origem]
+    destino = csr.indice[no_destino]
+    
+    if usar_heuristica:
+        fator = pesos_csr.fator_heuristica
+        h_destino = np.array(heuristicas_astar(G, no_destino, fator))
+        h_origem = np.array(heuristicas_astar(G, no_origem, fator))
+        potenciais = ((h_destino - h_origem) / 2).tolist()
+    else:
+        potenciais = [0] * num_nos
+    
+    # [0] = busca para frente (origem), [1] = busca para trás (destino)
+    sinais = [1, -1]
+    infinito = float("inf")
+    fechados = [bytearray(num_nos), bytearray(num_nos)]
+    dists = [[infinito] * num_nos, [infinito] * num_nos]
+    preds = [[-1] * num_nos, [-1] * num_nos]
+    dists[0][origem] = 0
+    dists[1][destino] = 0
+    filas = [
+        [(potenciais[origem], origem)],
+        [(-potenciais[destino], destino)],
+    ]
+    
+    mu = infinito
+    no_encontro = -1
+    
+    while True:
+        # Descarta entradas obsoletas (nós já fechados) do topo das filas,
+        # para que o critério de parada use os menores valores ainda válidos
+        for direcao in (0, 1):
+            fila_dir = filas[direcao]
+            fechados_dir = fechados[direcao]
+            while fila_dir and fechados_dir[fila_dir[0][1]]:
+                heappop(fila_dir)
         
-        # Usa apenas a primeira aresta disponível no multigraph
-        attrs = list(edge_data.values())[0]
+        if not (filas[0] and filas[1]):
+            break
         
-        geom = attrs.get("geometry")
+        topo_frente = filas[0][0][0]
+        topo_tras = filas[1][0][0]
         
-        if geom:
-            # Se tem geometria, usa todos os pontos da curva
-            for lng, lat in geom.coords:  # coords vêm como (lon, lat)
-                pontos_rota.append((lat, lng))
-        else:
-            # Se não tem geometria, usa linha reta entre os nós
-            pontos_rota.append((G.nodes[u]["y"], G.nodes[u]["x"]))
-            pontos_rota.append((G.nodes[v]["y"], G.nodes[v]["x"]))
+        # Nenhum caminho ainda não visto pode ser menor que mu
+        if topo_frente + topo_tras >= mu:
+            break
+        
+        direcao = 0 if topo_frente <= topo_tras else 1
+        _, v = heappop(filas[direcao])
+        
+        fechados_dir = fechados[direcao]
+        fechados_dir[v] = 1
+        
+        dists_dir = dists[direcao]
+        dists_outra = dists[1 - direcao]
+        preds_dir = preds[direcao]
+        fila_dir = filas[direcao]
+        sinal = sinais[direcao]
+        indptr, indices = csr.adjacencias[direcao]
+        pesos = pesos_csr.listas[direcao]
+        dist = dists_dir[v]
+        
+        for k in range(indptr[v], indptr[v + 1]):
+            w = indices[k]
+            if fechados_dir[w]:
+                continue
+            
+            dist_vw = dist + pesos[k]
+            
+            if dist_vw < dists_dir[w]:
+                dists_dir[w] = dist_vw
+                preds_dir[w] = v
+                heappush(fila_dir, (dist_vw + sinal * potenciais[w], w))
+                
+                # Verifica se esse encontro melhora o melhor caminho conhecido
+                if dist_vw + dists_outra[w] < mu:
+                    mu = dist_vw + dists_outra[w]
+                    no_encontro = w
+    
+    if no_encontro < 0:
+        raise nx.NetworkXNoPath(f"Sem caminho entre {no_origem} e {no_destino}.")
+    
+    rota = []
+    v = no_encontro
+    while v >= 0:
+        rota.append(v)
+        v = preds[0][v]
+    rota.reverse()
+    v = preds[1][no_encontro]
+    while v >= 0:
+        rota.append(v)
+        v = preds[1][v]
     
-    return pontos_rota
+    nos_explorados = sum(fechados[0]) + sum(fechados[1])
+    return mu, [nos[v] for v in rota], nos_explorados
 
 
-def calcular_rota(G, origem, destino, algoritmo="astar"):
+def _dijkstra_unidirecional(G, no_origem, no_destino, perfil=None):
     """
-    Calcula a rota mais curta entre dois pontos usando A*, Dijkstra bidirecional ou Dijkstra unidirecional.
+    Dijkstra unidirecional pela implementação em C do scipy.sparse.csgraph.
+    
+    Args:
+        G: Grafo NetworkX
+        no_origem: ID do nó de origem
+        no_destino: ID do nó de destino
+        perfil: Perfil de mobilidade (None = atributo 'length' atual)
+        
+    Returns:
+        Tupla (distancia, rota_nodes, nos_explorados)
+        
+    Raises:
+        nx.NetworkXNoPath: Se o destino não for alcançável
+    """
+    csr = _obter_csr(G)
+    origem = csr.indice[no_origem]
+    destino = csr.indice[no_destino]
+    
+    distancias, predecessores = dijkstra(
+        _obter_pesos_csr(G, perfil).matriz, indices=origem, return_predecessors=True
+    )
+    
+    distancia = distancias[destino]
+    if not np.isfinite(distancia):
+        raise nx.NetworkXNoPath(f"Nó {no_destino} não alcançável a partir de {no_origem}")
+    
+    rota = [destino]
+    while rota[-1] != origem:
+        rota.append(predecessores[rota[-1]])
+    rota_nodes = [csr.nos[i] for i in reversed(rota)]
+    
+    # Nós que uma busca com parada no destino teria fechado
+    nos_explorados = int(np.count_nonzero(distancias <= distancia))
+    
+    return float(distancia), rota_nodes, nos_explorados
+
+
+def calcular_rota(G, origem, destino, algoritmo="astar", return_stats=False, perfil=None,
+                  usar_cache=False):
+    """
+    Calcula a rota mais curta entre dois pontos usando A*, A* bidirecional,
+    Dijkstra bidirecional ou Dijkstra unidirecional.
     
     Args:
         G: Grafo NetworkX
         origem: Tupla (lat, lon) do ponto de origem
         destino: Tupla (lat, lon) do ponto de destino
-        algoritmo: "astar" (padrão), "dijkstra" (bidirecional), ou "dijkstra_uni" (unidirecional)
+        algoritmo: "astar" (padrão), "biastar" (A* bidirecional),
+            "dijkstra"/"bidijkstra" (bidirecional) ou "dijkstra_uni" (unidirecional)
+        return_stats: Se True, também retorna o número de nós explorados pela busca
+        perfil: Perfil de mobilidade que pondera as arestas (None = atributo 'length' atual)
+        usar_cache: Se True, reaproveita buscas e consultas de nó mais próximo
+            já feitas (ver calcular_rota_por_nos e no_mais_proximo)
         
     Returns:
-        Tupla (pontos_rota, distancia) ou (None, None) se não houver rota
+        Tupla (pontos_rota, distancia) ou (None, None) se não houver rota.
+        Com return_stats=True: (pontos_rota, distancia, nos_explorados)
     """
     try:
         # Encontra os nós mais próximos no grafo
-        no_origem = ox.distance.nearest_nodes(G, origem[1], origem[0])
-        no_destino = ox.distance.nearest_nodes(G, destino[1], destino[0])
+        no_origem = no_mais_proximo(G, origem[0], origem[1], usar_cache)
+        no_destino = no_mais_proximo(G, destino[0], destino[1], usar_cache)
+    except Exception as e:
+        st.error(f"⚠️ Erro ao calcular rota: {e}")
+        return (None, None, None) if return_stats else (None, None)
+    
+    return calcular_rota_por_nos(
+        G, no_origem, no_destino, algoritmo, return_stats, perfil, usar_cache
+    )
+
+
+def _buscar_rota(G, no_origem, no_destino, algoritmo, perfil):
+    """
+    Executa a busca escolhida entre dois nós do grafo.
+    
+    Args:
+        G: Grafo NetworkX
+        no_origem: ID do nó de origem
+        no_destino: ID do nó de destino
+        algoritmo: Nome do algoritmo, em minúsculas
+        perfil: Perfil de mobilidade (None = atributo 'length' atual)
         
+    Returns:
+        Tupla (distancia, rota_nodes, nos_explorados)
+        
+    Raises:
+        nx.NetworkXNoPath: Se não houver rota
+    """
+    # Os algoritmos do NetworkX usam o DiGraph simples de GrafoCSR,
+    # lendo o peso do perfil pela posição CSR de cada aresta
+    csr = _obter_csr(G)
+    pesos_csr = _obter_pesos_csr(G, perfil)
+    pesos = pesos_csr.listas[0]
+    
+    if algoritmo == "astar":
+        # Usa A* com heurística de distância euclidiana (unidirecional),
+        # pré-calculada para todos os nós em relação ao destino
+        h_destino = heuristicas_astar(G, no_destino, pesos_csr.fator_heuristica)
+        
+        def heuristica(u, v):
+            return h_destino[u]
+        
+        explorados = set()
+        rota = nx.astar_path(
+            csr.digrafo, 
+            csr.indice[no_origem], 
+            csr.indice[no_destino], 
+            heuristic=heuristica,
+            weight=_peso_com_contagem(pesos, explorados)
+        )
+        # Soma os pesos ao longo do caminho em vez de repetir a busca
+        digrafo = csr.digrafo
+        distancia = sum(
+            pesos[digrafo[u][v]["posicao"]]
+            for u, v in pairwise(rota)
+        )
+        rota_nodes = [csr.nos[i] for i in rota]
+        nos_explorados = len(explorados)
+    elif algoritmo == "biastar":
+        # A* BIDIRECIONAL com potencial médio sobre a mesma heurística
+        distancia, rota_nodes, nos_explorados = _busca_bidirecional(
+            G, no_origem, no_destino, usar_heuristica=True, perfil=perfil
+        )
+    elif algoritmo == "dijkstra_uni":
+        distancia, rota_nodes, nos_explorados = _dijkstra_unidirecional(
+            G, no_origem, no_destino, perfil=perfil
+        )
+    else:  # dijkstra / bidijkstra (bidirecional)
+        distancia, rota_nodes, nos_explorados = _busca_bidirecional(
+            G, no_origem, no_destino, perfil=perfil
+        )
+    
+    return distancia, rota_nodes, nos_explorados
+
+
+def calcular_rota_por_nos(G, no_origem, no_destino, algoritmo="astar", return_stats=False, perfil=None,
+                          usar_cache=False):
+    """
+    Calcula a rota mais curta entre dois nós já conhecidos do grafo.
+    
+    Mesmo comportamento de calcular_rota, mas sem a etapa de encontrar os nós
+    mais próximos (útil quando os nós já foram resolvidos, como em benchmarks).
+    
+    Args:
+        G: Grafo NetworkX
+        no_origem: ID do nó de origem
+        no_destino: ID do nó de destino
+        algoritmo: Mesmas opções de calcular_rota
+        return_stats: Se True, também retorna o número de nós explorados pela busca
+        perfil: Perfil de mobilidade que pondera as arestas (None = atributo 'length' atual)
+        usar_cache: Se True, reaproveita buscas já feitas para os mesmos nós,
+            algoritmo e perfil (desligado por padrão para não distorcer benchmarks)
+        
+    Returns:
+        Tupla (pontos_rota, distancia) ou (None, None) se não houver rota.
+        Com return_stats=True: (pontos_rota, distancia, nos_explorados)
+    """
+    falha = (None, None, None) if return_stats else (None, None)
+    
+    try:
         # Calcula caminho de acordo com o algoritmo escolhido
-        if algoritmo.lower() == "astar":
-            # Usa A* com heurística de distância euclidiana (unidirecional)
-            rota_nodes = nx.astar_path(
-                G, 
-                no_origem, 
-                no_destino, 
-                heuristic=lambda u, v: heuristica_astar(G, u, v),
-                weight="length"
-            )
-            distancia = nx.astar_path_length(
-                G,
-                no_origem,
-                no_destino,
-                heuristic=lambda u, v: heuristica_astar(G, u, v),
-                weight="length"
+        algoritmo = algoritmo.lower()
+        
+        def buscar():
+            return _buscar_rota(G, no_origem, no_destino, algoritmo, perfil)
+        
+        if usar_cache:
+            # O Streamlit refaz as mesmas consultas a cada interação; falhas
+            # levantam exceção e por isso não entram no cache
+            distancia, rota_nodes, nos_explorados = _memorizar(
+                G, "rotas", (no_origem, no_destino, algoritmo, perfil), 4096, buscar
             )
-        elif algoritmo.lower() == "dijkstra_uni":
-            # Usa Dijkstra UNIDIRECIONAL (single-source)
-            # Calcula caminhos de origem para todos os nós, mas retorna apenas para destino
-            paths = nx.single_source_dijkstra_path(G, no_origem, weight="length")
-            lengths = nx.single_source_dijkstra_path_length(G, no_origem, weight="length")
-            
-            rota_nodes = paths[no_destino]
-            distancia = lengths[no_destino]
-        else:  # dijkstra (bidirecional - comportamento padrão do NetworkX)
-            # Usa Dijkstra BIDIRECIONAL (comportamento padrão de nx.shortest_path)
-            rota_nodes = nx.shortest_path(G, no_origem, no_destino, weight="length")
-            distancia = nx.shortest_path_length(G, no_origem, no_destino, weight="length")
+        else:
+            distancia, rota_nodes, nos_explorados = buscar()
         
         # Extrai geometria completa
         pontos_rota = extrair_geometria_rota(G, rota_nodes)
         
+        if return_stats:
+            return pontos_rota, distancia, nos_explorados
         return pontos_rota, distancia
         
     except nx.NetworkXNoPath:
-        return None, None
+        return falha
     except Exception as e:
         st.error(f"⚠️ Erro ao calcular rota: {e}")
-        return None, None
+        return falha
 
 
-def calcular_rota_completa(G, origem, destino, perfil, algoritmo="astar"):
+def calcular_rota_completa(G, origem, destino, perfil, algoritmo="dijkstra_uni"):
     """
     Calcula a rota e exibe mensagens de feedback ao usuário.
     
@@ -150,7 +787,12 @@ def calcular_rota_completa(G, origem, destino, perfil, algoritmo="astar"):
         origem: Tupla (lat, lon) do ponto de origem
         destino: Tupla (lat, lon) do ponto de destino
         perfil: Perfil de mobilidade do usuário
-        algoritmo: "astar" (padrão), "dijkstra" (bidirecional), ou "dijkstra_uni" (unidirecional)
+        algoritmo: "dijkstra_uni" (padrão, unidirecional em C via SciPy),
+            "astar", "biastar" (A* bidirecional) ou "dijkstra"/"bidijkstra"
+            (bidirecional). Todos encontram uma rota de custo mínimo para o
+            perfil (as A* usam a heurística ajustada por fator_heuristica);
+            em empates, a rota escolhida pode variar. O padrão é o mais
+            rápido no grafo do campus.
         
     Returns:
         Tupla (pontos_rota, distancia) ou (None, None) se não houver rota
@@ -158,13 +800,17 @@ def calcular_rota_completa(G, origem, destino, perfil, algoritmo="astar"):
     # Mensagem do spinner diferenciada por algoritmo
     if algoritmo.lower() == "astar":
         mensagem_spinner = "🔍 Calculando melhor rota (A*)..."
+    elif algoritmo.lower() == "biastar":
+        mensagem_spinner = "🔍 Calculando melhor rota (A* Bidirecional)..."
     elif algoritmo.lower() == "dijkstra_uni":
         mensagem_spinner = "🔍 Calculando melhor rota (Dijkstra Unidirecional)..."
     else:
         mensagem_spinner = "🔍 Calculando melhor rota (Dijkstra Bidirecional)..."
     
     with st.spinner(mensagem_spinner):
-        pontos_rota, distancia = calcular_rota(G, origem, destino, algoritmo)
+        pontos_rota, distancia = calcular_rota(
+            G, origem, destino, algoritmo, perfil=perfil, usar_cache=True
+        )
         
         if pontos_rota is None:
             st.error("❌ Não existe rota caminhável entre esses pontos.")
@@ -197,12 +843,16 @@ def gerar_gpx(rota, nome_rota="Rota Campus Unifor"):
   http://www.topografix.com/GPX/1/1/gpx.xsd">
 '''
     
-    gpx_track = f'  <trk>\n    <name>{nome_rota}</name>\n    <trkseg>\n'
-    
-    for lat, lon in rota:
-        gpx_track += f'      <trkpt lat="{lat}" lon="{lon}"></trkpt>\n'
+    # Monta os pontos de uma vez com join (evita concatenar string a string)
+    gpx_pontos = "".join(
+        f'      <trkpt lat="{lat}" lon="{lon}"></trkpt>\n' for lat, lon in rota
+    )
     
-    gpx_track += '    </trkseg>\n  </trk>\n'
+    gpx_track = (
+        f'  <trk>\n    <name>{nome_rota}</name>\n    <trkseg>\n'
+        f'{gpx_pontos}'
+        '    </trkseg>\n  </trk>\n'
+    )
     gpx_footer = '</gpx>'
     
     return gpx_header + gpx_track + gpx_footer
\ No newline at end of file
@@ -1,6 +1,7 @@
 # ui_components.py - COMPONENTES DE INTERFACE
 
 import streamlit as st
+from collections import defaultdict
 import folium
 from streamlit_folium import st_folium
 from config import CENTRO_MAPA, ZOOM_INICIAL, TILES_URL, TILES_ATTR, VELOCIDADE_CAMINHADA, TAMANHO_PASSO
@@ -49,6 +50,38 @@ def renderizar_cabecalho():
     st.divider()
 
 
+@st.cache_data(show_spinner=False)
+def montar_opcoes_pois(categorias_itens):
+    """
+    Monta a lista de opções dos seletores de origem/destino.
+    
+    Os POIs são agrupados por categoria, em ordem alfabética, com uma linha
+    separadora antes de cada categoria.
+    
+    Args:
+        categorias_itens: Tupla de pares (nome, categoria) dos POIs
+        
+    Returns:
+        Lista de opções, começando por "Selecione..."
+    """
+    # Organizar POIs por categoria
+    pois_por_categoria = defaultdict(list)
+    for nome, categoria in categorias_itens:
+        pois_por_categoria[categoria].append(nome)
+    
+    opcoes = ["Selecione..."]
+    
+    # Ordenar categorias e POIs dentro de cada categoria
+    for categoria in sorted(pois_por_categoria):
+        # Adiciona separador visual
+        opcoes.append(f"--- {categoria} ---")
+        
+        # Adiciona POIs da categoria
+        opcoes.extend(f"  {poi}" for poi in sorted(pois_por_categoria[categoria]))
+    
+    return opcoes
+
+
 def renderizar_sidebar(G, pontos, categorias):
     """
     Renderiza a barra lateral com controles e informações.
@@ -61,6 +94,9 @@ def renderizar_sidebar(G, pontos, categorias):
     Returns:
         Lista com [origem, destino] se POIs foram selecionados, None caso contrário
     """
+    # Categorias distintas, usadas no filtro e nas estatísticas
+    categorias_unicas = sorted(set(categorias.values()))
+    
     with st.sidebar:
         st.header("⚙️ Painel de Controle")
         
@@ -110,42 +146,19 @@ def renderizar_sidebar(G, pontos, categorias):
         if pontos:
             st.subheader("📍 Selecionar Pontos de Interesse")
             
-            # Organizar POIs por categoria
-            pois_por_categoria = {}
-            for nome, categoria in categorias.items():
-                if categoria not in pois_por_categoria:
-                    pois_por_categoria[categoria] = []
-                pois_por_categoria[categoria].append(nome)
-            
-            # Ordenar categorias e POIs dentro de cada categoria
-            for cat in pois_por_categoria:
-                pois_por_categoria[cat].sort()
-            
-            # Criar lista de opções com separadores
-            opcoes_origem = ["Selecione..."]
-            opcoes_destino = ["Selecione..."]
-            
-            for categoria in sorted(pois_por_categoria.keys()):
-                # Adiciona separador visual
-                separador = f"--- {categoria} ---"
-                opcoes_origem.append(separador)
-                opcoes_destino.append(separador)
-                
-                # Adiciona POIs da categoria
-                for poi in pois_por_categoria[categoria]:
-                    opcoes_origem.append(f"  {poi}")
-                    opcoes_destino.append(f"  {poi}")
+            # Lista de opções com separadores (montada uma vez por conjunto de POIs)
+            opcoes_pois = montar_opcoes_pois(tuple(categorias.items()))
             
             # Selectboxes
             poi_origem = st.selectbox(
                 "🔵 Ponto de Origem",
-                opcoes_origem,
+                opcoes_pois,
                 key="poi_origem"
             )
             
             poi_destino = st.selectbox(
                 "🔴 Ponto de Destino",
-                opcoes_destino,
+                opcoes_pois,
                 key="poi_destino"
             )
             
@@ -169,7 +182,6 @@ def renderizar_sidebar(G, pontos, categorias):
             
             # Filtro por categoria
             st.subheader("🔍 Filtrar no Mapa")
-            categorias_unicas = sorted(set(categorias.values()))
             
             if "filtros_categorias" not in st.session_state:
                 st.session_state["filtros_categorias"] = categorias_unicas
@@ -194,7 +206,7 @@ def renderizar_sidebar(G, pontos, categorias):
             st.metric("POIs", len(pontos))
         with col2:
             st.metric("Arestas", len(G.edges))
-            st.metric("Categorias", len(set(categorias.values())))
+            st.metric("Categorias", len(categorias_unicas))
         
         # Densidade do grafo
         densidade = len(G.edges) / len(G.nodes) if len(G.nodes) > 0 else 0
@@ -238,27 +250,59 @@ def criar_mapa_base():
     return m
 
 
+@st.cache_data(show_spinner=False)
+def preparar_marcadores_pois(pontos_itens, categorias_itens):
+    """
+    Prepara os dados dos marcadores de POIs, agrupados por categoria.
+    
+    Só guarda dados simples: os objetos do Folium precisam ser novos a cada
+    mapa, porque o st_folium renomeia os elementos ao gerar o JavaScript e um
+    elemento reaproveitado passaria a referenciar variáveis não declaradas.
+    
+    Args:
+        pontos_itens: Tupla de pares (nome, (lat, lon))
+        categorias_itens: Tupla de pares (nome, categoria)
+        
+    Returns:
+        Dicionário {categoria: [(lat, lon, popup, tooltip, cor, icone), ...]}
+    """
+    categorias = dict(categorias_itens)
+    marcadores = defaultdict(list)
+    
+    for nome, (lat, lon) in pontos_itens:
+        categoria = categorias.get(nome, "Outros")
+        
+        # Define cor e ícone baseado na categoria
+        marcadores[categoria].append((
+            lat,
+            lon,
+            f"<b>{nome}</b><br><i>{categoria}</i>",
+            f"{nome} ({categoria})",
+            CORES_CATEGORIAS.get(categoria, "gray"),
+            ICONES_CATEGORIAS.get(categoria, "map-marker"),
+        ))
+    
+    return dict(marcadores)
+
+
 def adicionar_pois_ao_mapa(m, pontos, categorias):
     """Adiciona marcadores de POIs ao mapa com cores por categoria"""
     filtros_ativos = st.session_state.get("filtros_categorias", list(set(categorias.values())))
     
-    for nome, (lat, lon) in pontos.items():
-        categoria = categorias.get(nome, "Outros")
-        
+    marcadores = preparar_marcadores_pois(tuple(pontos.items()), tuple(categorias.items()))
+    
+    for categoria, itens in marcadores.items():
         # Aplica filtro
         if categoria not in filtros_ativos:
             continue
         
-        # Define cor e ícone baseado na categoria
-        cor = CORES_CATEGORIAS.get(categoria, "gray")
-        icone = ICONES_CATEGORIAS.get(categoria, "map-marker")
-        
-        folium.Marker(
-            [lat, lon],
-            popup=folium.Popup(f"<b>{nome}</b><br><i>{categoria}</i>", max_width=250),
-            tooltip=f"{nome} ({categoria})",
-            icon=folium.Icon(color=cor, icon=icone, prefix="glyphicon")
-        ).add_to(m)
+        for lat, lon, popup, tooltip, cor, icone in itens:
+            folium.Marker(
+                [lat, lon],
+                popup=folium.Popup(popup, max_width=250),
+                tooltip=tooltip,
+                icon=folium.Icon(color=cor, icon=icone, prefix="glyphicon")
+            ).add_to(m)
 
 
 def adicionar_marcadores_rota(m):
@@ -309,7 +353,8 @@ def renderizar_mapa(pontos, categorias, perfil):
     Returns:
         Dados do mapa (cliques e interações)
     """
-    # Cria mapa base
+    # Cria mapa base (sempre um objeto novo: o st_folium altera os elementos
+    # ao renderizar, e um mapa reaproveitado gera JavaScript inválido)
     m = criar_mapa_base()
     
     # Adiciona elementos
@@ -329,6 +374,30 @@ def renderizar_mapa(pontos, categorias, perfil):
     return map_data
 
 
+def obter_gpx_rota(rota, nome_rota):
+    """
+    Retorna o GPX da rota, gerado uma única vez por rota calculada.
+    
+    O Streamlit reexecuta o script a cada interação; o GPX fica guardado no
+    estado da sessão junto com a lista da rota (comparada por identidade,
+    já que uma nova rota é sempre uma nova lista).
+    
+    Args:
+        rota: Lista de pontos (lat, lon) guardada em st.session_state["rota"]
+        nome_rota: Nome da rota para o arquivo GPX
+        
+    Returns:
+        String com conteúdo XML do GPX
+    """
+    gpx_cache = st.session_state.get("gpx_cache")
+    
+    if gpx_cache is None or gpx_cache[0] is not rota or gpx_cache[1] != nome_rota:
+        gpx_cache = (rota, nome_rota, gerar_gpx(rota, nome_rota))
+        st.session_state["gpx_cache"] = gpx_cache
+    
+    return gpx_cache[2]
+
+
 def renderizar_informacoes_rota(perfil):
     """Renderiza as informações da rota calculada"""
     distancia = st.session_state.get("distancia")
@@ -387,7 +456,7 @@ def renderizar_informacoes_rota(perfil):
     # Botão de exportar
     st.markdown("---")
     
-    gpx_data = gerar_gpx(rota, f"Rota Unifor - {perfil.nome}")
+    gpx_data = obter_gpx_rota(rota, f"Rota Unifor - {perfil.nome}")
     
     col1, col2, col3 = st.columns([1, 1, 1])
     